@@ -1,56 +1,167 @@
-import json
+import os
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-from datetime import datetime
 import matplotlib.dates as mdates
 from flask import Flask, send_file
 import io
 import threading
 import time
 
+try:
+    import orjson
+
+    def _load_json(f):
+        return orjson.loads(f.read())
+except ImportError:
+    import json
+
+    def _load_json(f):
+        return json.load(f)
+
+METRICS_PATH = 'metrics/metrics.json'
+# Only these fields are plotted, the rest of each record is dropped on load
+METRICS_COLUMNS = ['timestamp', 'files_per_second_wall_time']
+
 app = Flask(__name__)
 
+# Parsed metrics, reused until metrics.json changes on disk. The exporter
+# rewrites the whole file, normally keeping earlier records and adding one.
+# 'count' and 'last_timestamp' identify the prefix that is already parsed.
+# The dict is never mutated, each reload swaps in a new one so concurrent
+# callers always see a consistent snapshot.
+_cache = {'mtime': None, 'count': 0, 'last_timestamp': None, 'timestamps': None, 'fps': None}
+
 def parse_metrics():
-    with open('metrics/metrics.json', 'r') as f:
-        data = json.load(f)
+    global _cache
+    cache = _cache
+    mtime = os.stat(METRICS_PATH).st_mtime_ns
+    if cache['mtime'] == mtime:
+        return cache['timestamps'], cache['fps']
+
+    with open(METRICS_PATH, 'rb') as f:
+        data = _load_json(f)
+    
+    count = len(data)
+    cached, timestamps, fps = cache['count'], cache['timestamps'], cache['fps']
+    if cached and (count < cached or data[cached - 1].get('timestamp') != cache['last_timestamp']):
+        # File was truncated or replaced, parse it from the start
+        cached, timestamps, fps = 0, None, None
+    new = data[cached:]
     
-    # Extract timestamps and files per second
-    timestamps = [datetime.fromisoformat(m['timestamp'].replace('Z', '+00:00')) for m in data]
-    fps = [m['files_per_second_wall_time'] for m in data]
+    if new or timestamps is None:
+        # Extract timestamps (normalized to UTC) and files per second in one vectorized pass
+        raw = pd.DataFrame.from_records(new, columns=METRICS_COLUMNS)
+        new_timestamps = pd.to_datetime(raw['timestamp'], utc=True, format='ISO8601').dt.tz_localize(None).to_numpy()
+        new_fps = raw['files_per_second_wall_time'].to_numpy(dtype=np.float32)
+        
+        if timestamps is None:
+            timestamps, fps = new_timestamps, new_fps
+        else:
+            timestamps = np.concatenate([timestamps, new_timestamps])
+            fps = np.concatenate([fps, new_fps])
     
+    last_timestamp = data[-1].get('timestamp') if data else None
+    _cache = {'mtime': mtime, 'count': count, 'last_timestamp': last_timestamp, 'timestamps': timestamps, 'fps': fps}
     return timestamps, fps
 
+# Single persistent figure, updated in place on every refresh
+_fig, _ax = plt.subplots(figsize=(12, 6))
+_line, = _ax.plot([], [], marker='o', linestyle='-', linewidth=2, markersize=8, rasterized=True)
+
+# Customize the plot
+_ax.set_title('Files Processed per Second Over Time', fontsize=14, pad=20)
+_ax.set_xlabel('Timestamp', fontsize=12)
+_ax.set_ylabel('Files per Second', fontsize=12)
+
+# Format x-axis
+_ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+_ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+_fig.autofmt_xdate()  # Rotate and align the tick labels
+
+# Add grid
+_ax.grid(True, linestyle='--', alpha=0.7)
+
+# Tight layout
+_fig.tight_layout()
+
+# Matplotlib is not thread-safe, serialize access to the shared figure
+_plot_lock = threading.Lock()
+
 def create_plot():
-    # Create the plot
-    plt.figure(figsize=(12, 6))
-    plt.clf()  # Clear the current figure
-    
     # Get the data
     timestamps, fps = parse_metrics()
     
-    # Create the line plot
-    plt.plot(timestamps, fps, marker='o', linestyle='-', linewidth=2, markersize=8)
-    
-    # Customize the plot
-    plt.title('Files Processed per Second Over Time', fontsize=14, pad=20)
-    plt.xlabel('Timestamp', fontsize=12)
-    plt.ylabel('Files per Second', fontsize=12)
-    
-    # Format x-axis
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-    plt.gcf().autofmt_xdate()  # Rotate and align the tick labels
-    
-    # Add grid
-    plt.grid(True, linestyle='--', alpha=0.7)
-    
-    # Tight layout
-    plt.tight_layout()
-    
-    # Save plot to bytes buffer
     buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=300, bbox_inches='tight')
+    with _plot_lock:
+        # Update the line and rescale the axes to the new data
+        _line.set_data(timestamps, fps)
+        _ax.relim()
+        if len(timestamps) > 1:
+            # Metrics are appended chronologically, so the x range is known up front
+            margin = (timestamps[-1] - timestamps[0]) * _ax.margins()[0]
+            _ax.set_xlim(timestamps[0] - margin, timestamps[-1] + margin, auto=None)
+            _ax.autoscale_view(scalex=False)
+        else:
+            _ax.autoscale_view()
+        
+        # Save plot to bytes buffer
+        _fig.savefig(buf, format='png', dpi=100)
     buf.seek(0)
     return buf
 
+# Last rendered (etag, png) pair, the etag being the metrics.json mtime it was rendered from
+_latest_render = None
+_rendered_mtime = None
+_render_lock = threading.Lock()
+
+def _render_if_changed():
+    global _latest_render, _rendered_mtime
+    mtime = os.stat(METRICS_PATH).st_mtime_ns
+    if mtime == _rendered_mtime:
+        return
+    with _render_lock:
+        # Another thread may have rendered this version while we waited
+        if mtime != _rendered_mtime:
+            _latest_render = (str(mtime), create_plot().getvalue())
+            # Only mark the mtime as rendered once it succeeded, so a read of a
+            # half-written file is retried on the next tick
+            _rendered_mtime = mtime
+
+def _renderer_loop():
+    failed_mtime = None
+    while True:
+        try:
+            _render_if_changed()
+        except FileNotFoundError:
+            pass
+        except Exception:
+            # Keep retrying, but only log once per version of the file
+            try:
+                mtime = os.stat(METRICS_PATH).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != failed_mtime:
+                failed_mtime = mtime
+                app.logger.exception('Failed to render metrics plot')
+        time.sleep(1)
+
+_renderer_started = False
+_renderer_start_lock = threading.Lock()
+
+@app.before_request
+def _start_renderer():
+    # Started lazily so the renderer runs however the app is served
+    global _renderer_started
+    if _renderer_started:
+        return
+    with _renderer_start_lock:
+        if not _renderer_started:
+            threading.Thread(target=_renderer_loop, daemon=True).start()
+            _renderer_started = True
+
 @app.route('/')
 def home():
     return '''
@@ -84,9 +195,28 @@ def home():
                 }
             </style>
             <script>
-                function refreshImage() {
-                    const img = document.getElementById('plot');
-                    img.src = '/plot?' + new Date().getTime();
+                let lastEtag = null;
+                
+                async function refreshImage() {
+                    try {
+                        // Revalidate with the server, unchanged plots come back as 304
+                        const response = await fetch('/plot', { cache: 'no-cache' });
+                        const etag = response.headers.get('ETag');
+                        if (!response.ok || etag === lastEtag) {
+                            return;
+                        }
+                        lastEtag = etag;
+                        
+                        const img = document.getElementById('plot');
+                        const previous = img.src;
+                        img.src = URL.createObjectURL(await response.blob());
+                        if (previous.startsWith('blob:')) {
+                            URL.revokeObjectURL(previous);
+                        }
+                    } catch (e) {
+                        // Server unreachable, keep showing the last plot
+                        return;
+                    }
                 }
                 
                 // Refresh every 5 seconds
@@ -106,8 +236,13 @@ def home():
 
 @app.route('/plot')
 def plot():
-    buf = create_plot()
-    return send_file(buf, mimetype='image/png')
+    if _latest_render is None:
+        # The background renderer has not finished its first render yet
+        _render_if_changed()
+    etag, png = _latest_render
+    # send_file answers a matching If-None-Match with 304 and no body
+    return send_file(io.BytesIO(png), mimetype='image/png', etag=etag, max_age=1)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000) 
\ No newline at end of file
+    from waitress import serve
+    serve(app, host='0.0.0.0', port=5000, threads=8) 
\ No newline at end of file